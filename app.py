@@ -1,11 +1,18 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
 from azure.core.credentials import AzureKeyCredential
+import hashlib
 import io
-from PyPDF2 import PdfReader
+import math
+import re
+from collections import Counter
+import numpy as np
+import fitz
+from PIL import Image
 
 # Set page config to wide mode
 st.set_page_config(layout="wide")
@@ -13,43 +20,214 @@ st.set_page_config(layout="wide")
 # Get GitHub token from Streamlit secrets
 token = st.secrets["github"]["token"]
 
+# Maximum number of points sent to the browser per plot
+MAX_PLOT_POINTS = 50_000
+
+# Character budget for PDF text sent as chat context
+PDF_CONTEXT_CHARS = 1200
+
+# Target size of a PDF chunk when building chat context
+PDF_CHUNK_CHARS = 400
+
+# Number of chat answers kept per session for repeated questions
+MAX_CACHED_ANSWERS = 20
+
 # Azure inference endpoint and model
 endpoint = "https://models.inference.ai.azure.com"
 model_name = "gpt-4o"
 
-# Initialize the client with the token
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
-
-# Function to read PDF content
-def read_pdf(file):
-    pdf_reader = PdfReader(file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() + "\n"
-    return text
+# Initialize the client with the token, reused across reruns so its connection pool stays warm
+@st.cache_resource
+def get_client():
+    return ChatCompletionsClient(
+        endpoint=endpoint,
+        credential=AzureKeyCredential(token),
+    )
 
-# Function to load data from uploaded file
-def load_data(file):
-    file_extension = file.name.split(".")[-1].lower()
+# Function to parse raw file bytes, cached so reruns don't re-parse the same upload
+@st.cache_data(show_spinner=False)
+def _load_bytes(name, data):
+    file_extension = name.split(".")[-1].lower()
     if file_extension == "csv":
-        df = pd.read_csv(file)
+        df = pd.read_csv(io.BytesIO(data), engine="pyarrow", dtype_backend="pyarrow")
     elif file_extension in ["xls", "xlsx"]:
-        df = pd.read_excel(file)
+        df = pd.read_excel(io.BytesIO(data), engine="calamine", dtype_backend="pyarrow")
     elif file_extension == "pdf":
-        text = read_pdf(file)
-        return text
+        # PDFs stay as raw bytes; text is only extracted and chunked when a question is asked
+        return data
     else:
-        st.error("Unsupported file format. Please upload a CSV, XLSX, or PDF file.")
         return None
     return df
 
+# Function to read the text blocks (roughly paragraphs) of every PDF page
+def read_pdf_blocks(data):
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        blocks = []
+        for page in doc:
+            # Block tuples are (x0, y0, x1, y1, text, block_no, block_type); type 0 is text
+            blocks.extend(block[4] for block in page.get_text("blocks") if block[6] == 0)
+    return blocks
+
+# Function to greedily join pieces with spaces into strings of at most max_chars
+def _pack(pieces, max_chars):
+    packed = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > max_chars:
+            packed.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        packed.append(current)
+    return packed
+
+# Function to split an oversized paragraph at sentence, then word, boundaries
+def _split_paragraph(para, max_chars):
+    if len(para) <= max_chars:
+        return [para]
+    pieces = []
+    for sentence in re.split(r"(?<=[.!?])\s+", para):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+        else:
+            words = [w[i:i + max_chars] for w in sentence.split() for i in range(0, len(w), max_chars)]
+            pieces.extend(_pack(words, max_chars))
+    return _pack(pieces, max_chars)
+
+# Function to group text blocks into chunks of at most max_chars along paragraph and heading boundaries
+def _chunk_text(blocks, max_chars=PDF_CHUNK_CHARS):
+    chunks = []
+    current = ""
+    for block in blocks:
+        para = " ".join(block.split())
+        if not para:
+            continue
+        # Short blocks without closing punctuation are treated as headings and start a new chunk
+        is_heading = len(para) < 80 and not para.endswith((".", ":", ";", ","))
+        for i, unit in enumerate(_split_paragraph(para, max_chars)):
+            if current and ((is_heading and i == 0) or len(current) + len(unit) + 1 > max_chars):
+                chunks.append(current)
+                current = unit
+            else:
+                current = f"{current}\n{unit}" if current else unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+# Function to split text into lowercase word tokens
+def _tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+# Function to extract, chunk, and TF-IDF index the full PDF, cached per upload
+@st.cache_data(show_spinner=False)
+def _pdf_index(data):
+    chunks = _chunk_text(read_pdf_blocks(data))
+    chunk_terms = [Counter(_tokenize(c)) for c in chunks]
+    doc_freq = Counter(term for terms in chunk_terms for term in terms)
+    idf = {term: math.log(len(chunks) / df) + 1.0 for term, df in doc_freq.items()}
+
+    # Postings map each term to (chunk index, TF-IDF weight divided by the chunk's norm)
+    postings = {}
+    for i, terms in enumerate(chunk_terms):
+        norm = math.sqrt(sum((n * idf[t]) ** 2 for t, n in terms.items()))
+        for t, n in terms.items():
+            postings.setdefault(t, []).append((i, n * idf[t] / norm))
+    return {"chunks": chunks, "idf": idf, "postings": postings}
+
+# Function to pick the chunks most relevant to the question, within the character budget
+def _pdf_context(index, question, limit=PDF_CONTEXT_CHARS):
+    chunks, idf, postings = index["chunks"], index["idf"], index["postings"]
+    query = Counter(t for t in _tokenize(question) if t in idf)
+
+    # Only chunks sharing a term with the question get a non-zero TF-IDF cosine
+    scores = [0.0] * len(chunks)
+    for t, n in query.items():
+        for i, weight in postings[t]:
+            scores[i] += n * idf[t] * weight
+
+    # Rank by score; ties (including no overlap at all) keep document order
+    ranked = sorted(range(len(chunks)), key=lambda i: -scores[i])
+    selected, total = [], 0
+    for i in ranked:
+        # Every chunk fits within PDF_CHUNK_CHARS, so skip ones that would overflow and keep filling
+        if total + len(chunks[i]) > limit:
+            continue
+        selected.append(i)
+        total += len(chunks[i]) + 2
+    return "\n\n".join(chunks[i] for i in sorted(selected))
+
+# Function to load data from uploaded file
+def load_data(file):
+    data = _load_bytes(file.name, file.getvalue())
+    if data is None:
+        st.error("Unsupported file format. Please upload a CSV, XLSX, or PDF file.")
+    return data
+
+# Function to compute numeric summary statistics, cached per DataFrame
+@st.cache_data(show_spinner=False)
+def _describe(df):
+    # describe(include="number") raises on frames without numeric columns
+    if not _numeric_cols(df):
+        return pd.DataFrame()
+    return df.describe(include="number")
+
+# Function to list numeric columns from dtype metadata alone
+def _numeric_cols(df):
+    return [
+        col for col, dtype in df.dtypes.items()
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+    ]
+
+# Function to compute the correlation matrix of numeric columns, cached per DataFrame
+@st.cache_data(show_spinner=False)
+def _corr(df):
+    return df[_numeric_cols(df)].corr()
+
+# Function to downsample an ordered series with Largest-Triangle-Three-Buckets
+def _lttb(x, y, n_out):
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+# Function to reduce a line series to at most MAX_PLOT_POINTS, cached per selection
+@st.cache_data(show_spinner=False)
+def _line_points(df, x_col, y_col):
+    # Take the columns as separate Series: df[[x_col, y_col]] is two-dimensional per column when x_col == y_col
+    x, y = df[x_col], df[y_col]
+    mask = x.notna() & y.notna()
+    return _lttb(x[mask].to_numpy(dtype=float), y[mask].to_numpy(dtype=float), MAX_PLOT_POINTS)
+
+# Function to sample at most MAX_PLOT_POINTS rows for scatter plots, cached per DataFrame
+@st.cache_data(show_spinner=False)
+def _scatter_sample(df):
+    return df.sample(MAX_PLOT_POINTS, random_state=0) if len(df) > MAX_PLOT_POINTS else df
+
+# Function to sum bar heights per x value, cached per selection
+@st.cache_data(show_spinner=False)
+def _bar_points(df, x_col, y_col):
+    sums = df.groupby(x_col)[y_col].sum()
+    return sums.index.to_numpy(dtype=float), sums.to_numpy(dtype=float)
+
 # Function to create plots based on user selection
-def create_plot(df):
+def create_plot(df, numeric_cols, desc):
     if df is not None and isinstance(df, pd.DataFrame):
-        numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
         if len(numeric_cols) >= 2:
             plot_type = st.radio("Select Plot Type", ["Scatter Plot", "Line Chart", "Bar Chart", "Histogram"])
             
@@ -57,32 +235,99 @@ def create_plot(df):
             y_col = st.selectbox("Select Y-axis", numeric_cols) if plot_type != "Histogram" else None
 
             if plot_type == "Scatter Plot":
-                fig = px.scatter(df, x=x_col, y=y_col, title=f"{y_col} vs {x_col}")
+                fig = px.scatter(_scatter_sample(df), x=x_col, y=y_col, title=f"{y_col} vs {x_col}", render_mode="webgl")
             elif plot_type == "Line Chart":
-                fig = px.line(df, x=x_col, y=y_col, title=f"{y_col} vs {x_col}")
+                x, y = _line_points(df, x_col, y_col)
+                fig = go.Figure(go.Scattergl(x=x, y=y, mode="lines"))
+                fig.update_layout(title=f"{y_col} vs {x_col}", xaxis_title=x_col, yaxis_title=y_col)
             elif plot_type == "Bar Chart":
-                fig = px.bar(df, x=x_col, y=y_col, title=f"{y_col} by {x_col}")
+                x, y = _bar_points(df, x_col, y_col)
+                fig = go.Figure(go.Bar(x=x, y=y))
+                fig.update_layout(title=f"{y_col} by {x_col}", xaxis_title=x_col, yaxis_title=y_col)
             elif plot_type == "Histogram":
-                fig = px.histogram(df, x=x_col, title=f"Histogram of {x_col}")
+                fig = go.Figure(go.Histogram(x=df[x_col].dropna().to_numpy(dtype=float)))
+                fig.update_layout(title=f"Histogram of {x_col}", xaxis_title=x_col, yaxis_title="count")
 
             st.plotly_chart(fig, use_container_width=True)
 
             with st.expander("Brief Insights"):
                 if plot_type != "Histogram" and y_col:
-                    correlation = df[x_col].corr(df[y_col])
+                    correlation = _corr(df).loc[x_col, y_col]
                     st.write(f"Correlation between {x_col} and {y_col}: {correlation:.2f}")
                 st.write(f"Summary statistics for {x_col}:")
-                st.write(df[x_col].describe())
+                st.dataframe(desc[x_col], use_container_width=True)
                 if y_col:
                     st.write(f"Summary statistics for {y_col}:")
-                    st.write(df[y_col].describe())
+                    st.dataframe(desc[y_col], use_container_width=True)
         else:
             st.warning("The dataframe doesn't have enough numeric columns for plotting.")
     else:
         st.warning("Please upload a valid CSV or XLSX file for visualization.")
 
+# Function to yield text deltas from a streaming chat completion
+def _stream_text(response):
+    for update in response:
+        if update.choices and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+# Fragment for the plot controls, so widget changes only rerun the plot
+@st.fragment
+def _plot_fragment(df, numeric_cols, desc):
+    create_plot(df, numeric_cols, desc)
+
+# Fragment for the chat interface, so typing or submitting only reruns the chat
+@st.fragment
+def _chat_fragment(data, desc):
+    st.subheader("Ask a Question")
+    user_input = st.text_input("Enter your question", "What insights can you provide from the uploaded data?")
+
+    if st.button("Submit"):
+        # Prepare context from uploaded data
+        context = ""
+        if isinstance(data, pd.DataFrame):
+            context = f"Data summary (CSV):\n{desc.to_csv()}\n\n"
+        elif isinstance(data, bytes):
+            context = f"PDF content summary:\n{_pdf_context(_pdf_index(data), user_input)}\n\n"
+
+        # Reuse the answer if this exact context and question were already sent
+        answers = st.session_state.setdefault("answers", {})
+        key = (hashlib.blake2b(context.encode(), digest_size=8).hexdigest(), user_input)
+
+        st.write("Response:")
+        if key in answers:
+            # Move the hit to the end so the oldest unused answer is evicted first
+            answers[key] = answers.pop(key)
+            st.write(answers[key])
+        else:
+            # Send the request to Azure AI model
+            response = get_client().complete(
+                messages=[
+                    SystemMessage(content="You are a helpful assistant. Analyze the provided data and answer questions."),
+                    UserMessage(content=f"{context}User question: {user_input}"),
+                ],
+                model=model_name,
+                temperature=0.7,
+                max_tokens=1000,
+                top_p=1.0,
+                stream=True
+            )
+
+            # Stream the response into Streamlit as tokens arrive
+            answers[key] = st.write_stream(_stream_text(response))
+            while len(answers) > MAX_CACHED_ANSWERS:
+                answers.pop(next(iter(answers)))
+
+# Function to load the sidebar logo pre-resized to its display width, cached as PNG bytes
+@st.cache_data(show_spinner=False)
+def _logo(path="ragadata2.png", width=300):
+    img = Image.open(path)
+    img = img.resize((width, round(img.height * width / img.width)))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
 # Sidebar
-st.sidebar.image("ragadata2.png", use_column_width=True)  # Replace with your logo
+st.sidebar.image(_logo(), use_container_width=True)  # Replace with your logo
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Home", "About", "Guides", "Support"])
 
@@ -95,6 +340,16 @@ if page == "Home":
     if uploaded_file is not None:
         # Load the data
         data = load_data(uploaded_file)
+
+        # Compute summary statistics and numeric columns once per upload, replacing the previous upload's
+        desc, numeric_cols = None, []
+        if isinstance(data, pd.DataFrame):
+            stats = st.session_state.get("upload_stats")
+            if stats is None or stats["file_id"] != uploaded_file.file_id:
+                stats = {"file_id": uploaded_file.file_id, "desc": _describe(data), "num": _numeric_cols(data)}
+                st.session_state["upload_stats"] = stats
+            desc = stats["desc"]
+            numeric_cols = stats["num"]
         
         # Main content area
         main_container = st.container()
@@ -106,7 +361,7 @@ if page == "Home":
             with tab1:
                 if isinstance(data, pd.DataFrame):
                     st.subheader("Data Preview")
-                    st.write(data.head())
+                    st.dataframe(data.head(), use_container_width=True)
                     
                     with st.expander("Data Statistics"):
                         st.write(f"Number of rows: {data.shape[0]}")
@@ -114,41 +369,15 @@ if page == "Home":
                         st.write("Column types:")
                         st.write(data.dtypes)
                         st.write("Summary statistics:")
-                        st.write(data.describe())
+                        st.dataframe(desc, use_container_width=True)
                         
 
                 # Chat interface
-                st.subheader("Ask a Question")
-                user_input = st.text_input("Enter your question", "What insights can you provide from the uploaded data?")
-
-                if st.button("Submit"):
-                    # Prepare context from uploaded data
-                    context = ""
-                    if uploaded_file is not None:
-                        if isinstance(data, pd.DataFrame):
-                            context = f"Data summary:\n{data.describe().to_string()}\n\n"
-                        elif isinstance(data, str):
-                            context = f"PDF content summary:\n{data[:1000]}...\n\n"
-                    
-                    # Send the request to Azure AI model
-                    response = client.complete(
-                        messages=[
-                            SystemMessage(content="You are a helpful assistant. Analyze the provided data and answer questions."),
-                            UserMessage(content=f"{context}User question: {user_input}"),
-                        ],
-                        model=model_name,
-                        temperature=0.7,
-                        max_tokens=1000,
-                        top_p=1.0
-                    )
-
-                    # Display the response in Streamlit
-                    st.write("Response:")
-                    st.write(response.choices[0].message.content)
-            
+                _chat_fragment(data, desc)
+
             with tab2:
                 st.subheader("Data Visualization")
-                create_plot(data if isinstance(data, pd.DataFrame) else None)
+                _plot_fragment(data if isinstance(data, pd.DataFrame) else None, numeric_cols, desc)
 
 # Footer
     st.markdown("---")